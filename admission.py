@@ -0,0 +1,273 @@
+from collections import deque
+from functools import wraps
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import jsonify
+
+from schema import ValidationError, request_data
+
+# Defaults for the admission layer in front of the booking routes. The rates are
+# tokens per second, the bursts are the bucket sizes.
+GLOBAL_RATE = 200.0
+GLOBAL_BURST = 400
+CONFERENCE_RATE = 50.0
+CONFERENCE_BURST = 100
+MAX_QUEUE_DEPTH = 64
+# SQLite takes one writer at a time, so only a few booking transactions are let in at once
+MAX_IN_FLIGHT = 4
+QUEUE_TIMEOUT = 5.0
+MAX_TRACKED_CONFERENCES = 10000
+
+
+DATABASE_BUSY_RETRY_AFTER = 1
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def is_database_busy(error):
+    # sqlite3 reports lock contention that outlasted the busy timeout as "database is locked"
+    message = str(error)
+    return 'locked' in message or 'busy' in message
+
+
+def retry_response(reason, retry_after, status):
+    response = jsonify({"error": reason})
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response, status
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, now):
+        # returns 0 when a token was taken, otherwise the seconds until one is available
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def is_full(self, now):
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class AdmissionController:
+    """Token-bucket rate limits (global and per conference) plus a bounded FIFO queue per conference.
+
+    Requests for the same conference are let through one at a time in arrival order, the rest
+    wait in the queue. At most `max_in_flight` admitted requests run against the database at once.
+    Anything over the rate limits or the queue depth is rejected straight away so it never reaches
+    the database.
+    """
+
+    def __init__(self, global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST,
+                 conference_rate=CONFERENCE_RATE, conference_burst=CONFERENCE_BURST,
+                 max_queue_depth=MAX_QUEUE_DEPTH, queue_timeout=QUEUE_TIMEOUT, max_in_flight=MAX_IN_FLIGHT):
+        self.limits = {
+            "global_rate": global_rate,
+            "global_burst": global_burst,
+            "conference_rate": conference_rate,
+            "conference_burst": conference_burst,
+            "max_queue_depth": max_queue_depth,
+            "max_in_flight": max_in_flight,
+        }
+        self.workers = 1
+        self.conference_rate = conference_rate
+        self.conference_burst = conference_burst
+        self.max_queue_depth = max_queue_depth
+        self.queue_timeout = queue_timeout
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.active = 0
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.buckets = {}
+        self.queues = {}
+        self.lock = threading.Lock()
+        self.counters = {
+            "admitted": 0,
+            "rejected_global_rate": 0,
+            "rejected_conference_rate": 0,
+            "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0,
+            "rejected_in_flight_timeout": 0,
+            "rejected_database_busy": 0,
+        }
+
+    def configure(self, workers=1, **limits):
+        """Reset the controller with new totals split evenly across `workers` processes.
+
+        The state lives in this process only, so a server running several worker processes calls
+        this before forking. Whole-number limits are rounded down per worker but never below 1, so
+        the combined value can differ from the total. Returns {name: (total, combined)} for those.
+        """
+        totals = dict(self.limits, **limits)
+        per_worker = {
+            "global_rate": totals["global_rate"] / workers,
+            "global_burst": max(1, totals["global_burst"] // workers),
+            "conference_rate": totals["conference_rate"] / workers,
+            "conference_burst": max(1, totals["conference_burst"] // workers),
+            "max_queue_depth": max(1, totals["max_queue_depth"] // workers),
+            "max_in_flight": max(1, totals["max_in_flight"] // workers),
+        }
+        self.__init__(queue_timeout=self.queue_timeout, **per_worker)
+        self.limits = totals
+        self.workers = workers
+        return {name: (totals[name], value * workers) for name, value in per_worker.items()
+                if value * workers != totals[name]}
+
+    def _prune_buckets(self, now):
+        # forget conferences that are idle again so unknown names cannot grow the dict forever
+        for name in [name for name, bucket in self.buckets.items()
+                     if name not in self.queues and bucket.is_full(now)]:
+            del self.buckets[name]
+
+    def _refund(self, conference_name):
+        # a rejected request gives its tokens back so rejections don't eat into the rate limits
+        self.global_bucket.refund()
+        bucket = self.buckets.get(conference_name)
+        if bucket is not None:
+            bucket.refund()
+
+    def _enqueue(self, conference_name):
+        now = time.monotonic()
+        with self.lock:
+            retry_after = self.global_bucket.try_acquire(now)
+            if retry_after:
+                self.counters["rejected_global_rate"] += 1
+                raise AdmissionRejected("Too many booking requests", retry_after)
+
+            bucket = self.buckets.get(conference_name)
+            if bucket is None:
+                if len(self.buckets) >= MAX_TRACKED_CONFERENCES:
+                    self._prune_buckets(now)
+                bucket = self.buckets[conference_name] = TokenBucket(self.conference_rate,
+                                                                     self.conference_burst)
+            retry_after = bucket.try_acquire(now)
+            if retry_after:
+                self.global_bucket.refund()
+                self.counters["rejected_conference_rate"] += 1
+                raise AdmissionRejected("Too many booking requests for this conference", retry_after)
+
+            queue = self.queues.setdefault(conference_name, deque())
+            # the head of the queue is the request currently running, the rest are waiting
+            if len(queue) > self.max_queue_depth:
+                self._refund(conference_name)
+                self.counters["rejected_queue_full"] += 1
+                raise AdmissionRejected("Booking queue for this conference is full",
+                                        len(queue) / self.conference_rate)
+
+            turn = threading.Event()
+            queue.append(turn)
+            if len(queue) == 1:
+                turn.set()
+            return turn
+
+    def _leave(self, conference_name, turn):
+        with self.lock:
+            queue = self.queues[conference_name]
+            if queue[0] is turn:
+                queue.popleft()
+                if queue:
+                    queue[0].set()
+            else:
+                queue.remove(turn)
+            if not queue:
+                del self.queues[conference_name]
+
+    def enter(self, conference_name):
+        deadline = time.monotonic() + self.queue_timeout
+        turn = self._enqueue(conference_name)
+        if not turn.wait(self.queue_timeout):
+            with self.lock:
+                # the turn may have been handed over between the timeout and taking the lock
+                timed_out = not turn.is_set()
+                if timed_out:
+                    self.queues[conference_name].remove(turn)
+                    if not self.queues[conference_name]:
+                        del self.queues[conference_name]
+                    self._refund(conference_name)
+                    self.counters["rejected_queue_timeout"] += 1
+            if timed_out:
+                raise AdmissionRejected("Timed out waiting in the booking queue", self.queue_timeout)
+        # first in line for this conference, now wait for a free database slot shared by all conferences
+        if not self.in_flight.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self._leave(conference_name, turn)
+            with self.lock:
+                self._refund(conference_name)
+                self.counters["rejected_in_flight_timeout"] += 1
+            raise AdmissionRejected("Too many bookings in progress", self.queue_timeout)
+        with self.lock:
+            self.active += 1
+            self.counters["admitted"] += 1
+        return turn
+
+    def exit(self, conference_name, turn):
+        with self.lock:
+            self.active -= 1
+        self.in_flight.release()
+        self._leave(conference_name, turn)
+
+    def database_busy(self):
+        with self.lock:
+            self.counters["rejected_database_busy"] += 1
+        return retry_response("Database is busy, please retry", DATABASE_BUSY_RETRY_AFTER, 503)
+
+    def stats(self):
+        with self.lock:
+            depths = {name: len(queue) - 1 for name, queue in self.queues.items()}
+            return {
+                "pid": os.getpid(),
+                "workers": self.workers,
+                "counters": dict(self.counters),
+                "in_flight": self.active,
+                "queue_depths": depths,
+                "total_queued": sum(depths.values()),
+            }
+
+    def limit(self, field):
+        """Route decorator admitting requests keyed on the conference name in body field `field`."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                try:
+                    conference_name = request_data().get(field)
+                except ValidationError:
+                    conference_name = None
+                # malformed bodies go straight to the view, its schema reports the 400
+                if not isinstance(conference_name, str):
+                    return view(*args, **kwargs)
+                try:
+                    turn = self.enter(conference_name)
+                except AdmissionRejected as e:
+                    return retry_response(e.reason, e.retry_after, 429)
+                try:
+                    return view(*args, **kwargs)
+                except sqlite3.OperationalError as e:
+                    # lock errors a view lets escape instead of handling itself
+                    if is_database_busy(e):
+                        return self.database_busy()
+                    raise
+                finally:
+                    self.exit(conference_name, turn)
+            return wrapper
+        return decorator
@@ -1,12 +1,18 @@
-from flask import Flask, request, jsonify
+from flask import Flask, jsonify
 from datetime import datetime, timedelta, timezone
 import sqlite3
 import uuid
 
+from admission import AdmissionController, is_database_busy
+from schema import (BOOKING_SCHEMA, CONFERENCE_SCHEMA, USER_SCHEMA, ValidationError,
+                    request_data)
+
 app = Flask(__name__)
 
 DATABASE = 'conferences.db'
 
+admission = AdmissionController()
+
 
 def get_db_connection():
     conn = sqlite3.connect(DATABASE)
@@ -17,6 +23,8 @@ def get_db_connection():
 def create_tables():
     # called before everything else to set up all the tables and make sure everything is set up at the backend
     conn = get_db_connection()
+    # WAL lets readers run alongside the single writer instead of failing with "database is locked"
+    conn.execute('PRAGMA journal_mode=WAL')
     conn.execute('''CREATE TABLE IF NOT EXISTS conferences (
                     name TEXT PRIMARY KEY,
                     location TEXT,
@@ -45,7 +53,9 @@ def create_tables():
     conn.close()
 
 
-with app.app_context():
+@app.cli.command('init-db')
+def init_db():
+    # creates the tables once up front instead of on every import, serve.py does the same in its parent process
     create_tables()
 
 
@@ -53,65 +63,19 @@ def is_overlap(existing_start, existing_end, new_start, new_end):
     return not (existing_end <= new_start or existing_start >= new_end)
 
 
-def check_valid_string(word):
-    for letter in word:
-        if not (('a' <= letter <= 'z') or ('A' <= letter <= 'Z') or ('0' <= letter <= '9') or letter == ' '):
-            return False
-    return True
-
-def check_valid_string_userID(word):
-    for letter in word:
-        if not (('a' <= letter <= 'z') or ('A' <= letter <= 'Z') or ('0' <= letter <= '9')):
-            return False
-    return True
-
-
-
-def validate_timestamp(timestamp):
-    try:
-        datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ')
-        return True
-    except ValueError:
-        return False
-
 @app.route('/add_conference', methods=['POST'])
 def add_conference():
-    data = request.form
-    all_topics = data['topics'].split(',')
-    
-    if not check_valid_string(data['name']) or not check_valid_string(data['location']):
-        return jsonify({"error": "No other characters except alphanumeric characters and spaces are allowed for name, location."}), 400
-    
-    for topic in all_topics:
-        if not check_valid_string(topic):
-            return jsonify({"error": "No other characters except alphanumeric characters and spaces are allowed for topics."}), 400
-
-    if len(all_topics) > 10:
-        return jsonify({"error": "You are allowed to mention only up to 10 topics!"}), 400
+    try:
+        data = CONFERENCE_SCHEMA.load(request_data())
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
 
     name = data['name']
     location = data['location']
     topics = data['topics']
     start_timestamp = data['start_timestamp']
     end_timestamp = data['end_timestamp']
-
-    # Validate timestamp format
-    if not validate_timestamp(start_timestamp) or not validate_timestamp(end_timestamp):
-        return jsonify({"error": "Timestamp format is incorrect. Use 'YYYY-MM-DDTHH:MM:SSZ' format."}), 400
-
-    try:
-        start_timestamp = datetime.strptime(start_timestamp, '%Y-%m-%dT%H:%M:%SZ')
-        end_timestamp = datetime.strptime(end_timestamp, '%Y-%m-%dT%H:%M:%SZ')
-    except ValueError:
-        return jsonify({"error": "Timestamp format is incorrect. Use 'YYYY-MM-DDTHH:MM:SSZ' format."}), 400
-
-    try:
-        available_slots = int(data['available_slots'])
-    except ValueError:
-        return jsonify({"error": "Available slots should be an integer."}), 400
-
-    if available_slots <= 0:
-        return jsonify({"error": "Available slots should be greater than 0."}), 400
+    available_slots = data['available_slots']
 
     # Check if the time constraints are satisfied
     if start_timestamp >= end_timestamp or (end_timestamp - start_timestamp).total_seconds() > 43200:
@@ -136,25 +100,14 @@ def add_conference():
 @app.route('/add_user', methods=['POST'])
 def add_user():
     # adds a user to the database checking all the constraints being satisfied
-    data = request.form
-    
+    try:
+        data = USER_SCHEMA.load(request_data())
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+
     user_id = data['user_id']
     interested_topics = data['interested_topics']
 
-    if not check_valid_string_userID(user_id):
-        return jsonify({"error": "No other characters except alphanumeric characters for userID."}), 400
-    
-    
-    all_topics = data['interested_topics'].split(',')
-
-    if len(all_topics) > 50:
-        return jsonify({"error": "Maximum of 50 interested topics allowed."}), 400
-    for topic in all_topics:
-        if not check_valid_string(topic):
-            return jsonify(
-                {"error": "No other characters except alphanumeric characters and spaces are allowed for "
-                          "topics."}), 400
-
     try:
         conn = get_db_connection()
         conn.execute('''INSERT INTO users (user_id, interested_topics) VALUES (?, ?)''',
@@ -168,39 +121,49 @@ def add_user():
 
 
 @app.route('/book_conference', methods=['POST'])
+@admission.limit('conference_name')
 def book_conference():
-    data = request.form
+    try:
+        data = BOOKING_SCHEMA.load(request_data())
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+
     conference_name = data['conference_name']
     user_id = data['user_id']
 
     conn = get_db_connection()
-    conference = conn.execute('SELECT * FROM conferences WHERE name = ?', (conference_name,)).fetchone()
-    user = conn.execute('SELECT * FROM users WHERE user_id = ?', (user_id,)).fetchone()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
 
-    if not conference or not user:
-        conn.close()
-        return jsonify({"error": "Conference or User does not exist"}), 400
+        conference = conn.execute('SELECT * FROM conferences WHERE name = ?', (conference_name,)).fetchone()
+        user = conn.execute('SELECT * FROM users WHERE user_id = ?', (user_id,)).fetchone()
 
-    existing_booking = conn.execute('SELECT * FROM bookings WHERE user_id = ? AND conference_name = ?', 
-                                   (user_id, conference_name)).fetchone()
-    
-    if existing_booking:
-        conn.close()
-        return jsonify({"error": "User has already booked this conference.", "booking_id": existing_booking['booking_id']}), 400
-    
-    user_bookings = conn.execute('SELECT * FROM bookings WHERE user_id = ?', (user_id,)).fetchall()
-    for booking in user_bookings:
-        booked_conf = conn.execute('SELECT * FROM conferences WHERE name = ?', (booking['conference_name'],)).fetchone()
-        if is_overlap(datetime.fromisoformat(booked_conf['start_timestamp']),
-                      datetime.fromisoformat(booked_conf['end_timestamp']),
-                      datetime.fromisoformat(conference['start_timestamp']),
-                      datetime.fromisoformat(conference['end_timestamp'])):
+        if not conference or not user:
+            conn.execute('ROLLBACK')
             conn.close()
-            return jsonify({"error": "User has overlapping conference booked"}), 400
+            return jsonify({"error": "Conference or User does not exist"}), 400
+
+        # canceled bookings stay in the table but no longer block booking the conference again
+        existing_booking = conn.execute('''SELECT * FROM bookings WHERE user_id = ? AND conference_name = ?
+                                           AND status != 'canceled' ''', (user_id, conference_name)).fetchone()
+
+        if existing_booking:
+            conn.execute('ROLLBACK')
+            conn.close()
+            return jsonify({"error": "User has already booked this conference.", "booking_id": existing_booking['booking_id']}), 400
+
+        user_bookings = conn.execute("SELECT * FROM bookings WHERE user_id = ? AND status != 'canceled'",
+                                     (user_id,)).fetchall()
+        for booking in user_bookings:
+            booked_conf = conn.execute('SELECT * FROM conferences WHERE name = ?', (booking['conference_name'],)).fetchone()
+            if is_overlap(datetime.fromisoformat(booked_conf['start_timestamp']),
+                          datetime.fromisoformat(booked_conf['end_timestamp']),
+                          datetime.fromisoformat(conference['start_timestamp']),
+                          datetime.fromisoformat(conference['end_timestamp'])):
+                conn.execute('ROLLBACK')
+                conn.close()
+                return jsonify({"error": "User has overlapping conference booked"}), 400
 
-    try:
-        conn.execute('BEGIN TRANSACTION')
-        
         # Promote users from waitlist if slots are available
         while conference['available_slots'] > 0:
             waitlist_entry = conn.execute('''SELECT * FROM waitlists WHERE conference_name = ? 
@@ -236,12 +199,20 @@ def book_conference():
             conn.commit()
             conn.close()
             return jsonify({"message": "Added to waitlist", "waitlist_id": waitlist_id}), 201
-    except sqlite3.Error:
+    except sqlite3.Error as e:
         conn.rollback()
         conn.close()
+        if is_database_busy(e):
+            return admission.database_busy()
         return jsonify({"error": "Booking failed due to a database error"}), 500
 
 
+@app.route('/admission_stats', methods=['GET'])
+def admission_stats():
+    # queue depths and rejection counters of the booking admission layer
+    return jsonify(admission.stats()), 200
+
+
 @app.route('/booking_status/<booking_id>', methods=['GET'])
 def booking_status(booking_id):
     # gets the booking status for a users booking and return the status to the user
@@ -277,7 +248,7 @@ def confirm_waitlist_booking(booking_id):
             conference = conn.execute('SELECT * FROM conferences WHERE name = ?', (conference_name,)).fetchone()
             if conference['available_slots'] > 0:
                 try:
-                    conn.execute('BEGIN TRANSACTION')
+                    conn.execute('BEGIN IMMEDIATE')
                     conn.execute('UPDATE conferences SET available_slots = available_slots - 1 WHERE name = ?',
                                 (conference_name,))
                     conn.execute('DELETE FROM waitlists WHERE waitlist_id = ?', (booking_id,))
@@ -285,9 +256,11 @@ def confirm_waitlist_booking(booking_id):
                     conn.commit()
                     conn.close()
                     return jsonify({"message": "Booking confirmed"}), 200
-                except sqlite3.Error:
+                except sqlite3.Error as e:
                     conn.rollback()
                     conn.close()
+                    if is_database_busy(e):
+                        return admission.database_busy()
                     return jsonify({"error": "Booking confirmation failed due to a database error"}), 500
         conn.close()
         return jsonify({"error": "Booking cannot be confirmed"}), 400
@@ -302,7 +275,7 @@ def cancel_booking(booking_id):
 
     if booking:
         try:
-            conn.execute('BEGIN TRANSACTION')
+            conn.execute('BEGIN IMMEDIATE')
             if booking['status'] == 'confirmed':
                 conference_name = booking['conference_name']
                 conn.execute('UPDATE conferences SET available_slots = available_slots + 1 WHERE name = ?',
@@ -314,13 +287,16 @@ def cancel_booking(booking_id):
             conn.commit()
             conn.close()
             return jsonify({"message": "Booking canceled"}), 200
-        except sqlite3.Error:
+        except sqlite3.Error as e:
             conn.rollback()
             conn.close()
+            if is_database_busy(e):
+                return admission.database_busy()
             return jsonify({"error": "Booking cancellation failed due to a database error"}), 500
     conn.close()
     return jsonify({"error": "Booking ID not found"}), 404
 
 
 if __name__ == '__main__':
+    create_tables()
     app.run(debug=True)
@@ -1,12 +1,19 @@
 from flask import Flask, request, jsonify
 from datetime import datetime, timedelta, timezone
+import heapq
 import sqlite3
 import uuid
 
+from admission import AdmissionController, is_database_busy
+from schema import (BOOKING_SCHEMA, CONFERENCE_SCHEMA, USER_SCHEMA, ValidationError,
+                    request_data)
+
 app = Flask(__name__)
 
 DATABASE = 'conferences.db'
 
+admission = AdmissionController()
+
 
 def get_db_connection():
     conn = sqlite3.connect(DATABASE)
@@ -17,6 +24,8 @@ def get_db_connection():
 def create_tables():
     # called before everything else to set up all the tables and make sure everything is set up at the backend
     conn = get_db_connection()
+    # WAL lets readers run alongside the single writer instead of failing with "database is locked"
+    conn.execute('PRAGMA journal_mode=WAL')
     conn.execute('''CREATE TABLE IF NOT EXISTS conferences (
                     name TEXT PRIMARY KEY,
                     location TEXT,
@@ -41,11 +50,17 @@ def create_tables():
                     timestamp TEXT,
                     FOREIGN KEY(user_id) REFERENCES users(user_id),
                     FOREIGN KEY(conference_name) REFERENCES conferences(name))''')
+    # partial index over conferences that still have capacity, ordered by start for the suggestion sweep
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_conferences_open_start
+                    ON conferences(start_timestamp) WHERE available_slots > 0''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_bookings_user ON bookings(user_id)')
     conn.commit()
     conn.close()
 
 
-with app.app_context():
+@app.cli.command('init-db')
+def init_db():
+    # creates the tables once up front instead of on every import, serve.py does the same in its parent process
     create_tables()
 
 
@@ -53,65 +68,53 @@ def is_overlap(existing_start, existing_end, new_start, new_end):
     return not (existing_end <= new_start or existing_start >= new_end)
 
 
-def check_valid_string(word):
-    for letter in word:
-        if not (('a' <= letter <= 'z') or ('A' <= letter <= 'Z') or ('0' <= letter <= '9') or letter == ' '):
-            return False
-    return True
-
-def check_valid_string_userID(word):
-    for letter in word:
-        if not (('a' <= letter <= 'z') or ('A' <= letter <= 'Z') or ('0' <= letter <= '9')):
-            return False
-    return True
+def load_booked_intervals(conn, user_id):
+    # the names of the user's live bookings, and their (start, end) merged into disjoint intervals
+    # sorted by start. Canceled bookings are skipped, like book_conference does.
+    rows = conn.execute('''SELECT c.name, c.start_timestamp, c.end_timestamp FROM bookings b
+                           JOIN conferences c ON c.name = b.conference_name
+                           WHERE b.user_id = ? AND b.status != 'canceled'
+                           ORDER BY c.start_timestamp''', (user_id,)).fetchall()
+    booked_names = set()
+    merged = []
+    for name, start, end in rows:
+        booked_names.add(name)
+        if merged and start < merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return booked_names, merged
 
 
+def remove_clashing(conferences, booked_names, booked_intervals):
+    # conferences must be sorted by start_timestamp; timestamps are stored in one ISO format so they
+    # compare correctly as strings. Both lists are walked once, like is_overlap touching ends don't clash.
+    available = []
+    i = 0
+    for conf in conferences:
+        if conf['name'] in booked_names:
+            continue
+        while i < len(booked_intervals) and booked_intervals[i][1] <= conf['start_timestamp']:
+            i += 1
+        if i < len(booked_intervals) and booked_intervals[i][0] < conf['end_timestamp']:
+            continue
+        available.append(conf)
+    return available
 
-def validate_timestamp(timestamp):
-    try:
-        datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ')
-        return True
-    except ValueError:
-        return False
 
 @app.route('/add_conference', methods=['POST'])
 def add_conference():
-    data = request.form
-    all_topics = data['topics'].split(',')
-    
-    if not check_valid_string(data['name']) or not check_valid_string(data['location']):
-        return jsonify({"error": "No other characters except alphanumeric characters and spaces are allowed for name, location."}), 400
-    
-    for topic in all_topics:
-        if not check_valid_string(topic):
-            return jsonify({"error": "No other characters except alphanumeric characters and spaces are allowed for topics."}), 400
-
-    if len(all_topics) > 10:
-        return jsonify({"error": "You are allowed to mention only up to 10 topics!"}), 400
+    try:
+        data = CONFERENCE_SCHEMA.load(request_data())
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
 
     name = data['name']
     location = data['location']
     topics = data['topics']
     start_timestamp = data['start_timestamp']
     end_timestamp = data['end_timestamp']
-
-    # Validate timestamp format
-    if not validate_timestamp(start_timestamp) or not validate_timestamp(end_timestamp):
-        return jsonify({"error": "Timestamp format is incorrect. Use 'YYYY-MM-DDTHH:MM:SSZ' format."}), 400
-
-    try:
-        start_timestamp = datetime.strptime(start_timestamp, '%Y-%m-%dT%H:%M:%SZ')
-        end_timestamp = datetime.strptime(end_timestamp, '%Y-%m-%dT%H:%M:%SZ')
-    except ValueError:
-        return jsonify({"error": "Timestamp format is incorrect. Use 'YYYY-MM-DDTHH:MM:SSZ' format."}), 400
-
-    try:
-        available_slots = int(data['available_slots'])
-    except ValueError:
-        return jsonify({"error": "Available slots should be an integer."}), 400
-
-    if available_slots <= 0:
-        return jsonify({"error": "Available slots should be greater than 0."}), 400
+    available_slots = data['available_slots']
 
     # Check if the time constraints are satisfied
     if start_timestamp >= end_timestamp or (end_timestamp - start_timestamp).total_seconds() > 43200:
@@ -136,25 +139,14 @@ def add_conference():
 @app.route('/add_user', methods=['POST'])
 def add_user():
     # adds a user to the database checking all the constraints being satisfied
-    data = request.form
-    
+    try:
+        data = USER_SCHEMA.load(request_data())
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+
     user_id = data['user_id']
     interested_topics = data['interested_topics']
 
-    if not check_valid_string_userID(user_id):
-        return jsonify({"error": "No other characters except alphanumeric characters for userID."}), 400
-    
-    
-    all_topics = data['interested_topics'].split(',')
-
-    if len(all_topics) > 50:
-        return jsonify({"error": "Maximum of 50 interested topics allowed."}), 400
-    for topic in all_topics:
-        if not check_valid_string(topic):
-            return jsonify(
-                {"error": "No other characters except alphanumeric characters and spaces are allowed for "
-                          "topics."}), 400
-
     try:
         conn = get_db_connection()
         conn.execute('''INSERT INTO users (user_id, interested_topics) VALUES (?, ?)''',
@@ -168,14 +160,19 @@ def add_user():
 
 
 @app.route('/book_conference', methods=['POST'])
+@admission.limit('conference_name')
 def book_conference():
-    data = request.form
+    try:
+        data = BOOKING_SCHEMA.load(request_data())
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+
     conference_name = data['conference_name']
     user_id = data['user_id']
 
     conn = get_db_connection()
     try:
-        conn.execute('BEGIN TRANSACTION')
+        conn.execute('BEGIN IMMEDIATE')
         
         conference = conn.execute('SELECT * FROM conferences WHERE name = ?', (conference_name,)).fetchone()
         user = conn.execute('SELECT * FROM users WHERE user_id = ?', (user_id,)).fetchone()
@@ -185,15 +182,17 @@ def book_conference():
             conn.close()
             return jsonify({"error": "Conference or User does not exist"}), 400
 
-        existing_booking = conn.execute('SELECT * FROM bookings WHERE user_id = ? AND conference_name = ?', 
-                                       (user_id, conference_name)).fetchone()
+        # canceled bookings stay in the table but no longer block booking, suggest_conferences uses the same rule
+        existing_booking = conn.execute('''SELECT * FROM bookings WHERE user_id = ? AND conference_name = ?
+                                           AND status != 'canceled' ''', (user_id, conference_name)).fetchone()
 
         if existing_booking:
             conn.execute('ROLLBACK')
             conn.close()
             return jsonify({"error": "User has already booked this conference.", "booking_id": existing_booking['booking_id']}), 400
 
-        user_bookings = conn.execute('SELECT * FROM bookings WHERE user_id = ?', (user_id,)).fetchall()
+        user_bookings = conn.execute("SELECT * FROM bookings WHERE user_id = ? AND status != 'canceled'",
+                                     (user_id,)).fetchall()
         for booking in user_bookings:
             booked_conf = conn.execute('SELECT * FROM conferences WHERE name = ?', (booking['conference_name'],)).fetchone()
             if is_overlap(datetime.fromisoformat(booked_conf['start_timestamp']),
@@ -240,9 +239,17 @@ def book_conference():
     except sqlite3.OperationalError as e:
         conn.rollback()
         conn.close()
+        if is_database_busy(e):
+            return admission.database_busy()
         return jsonify({"error": f"Booking failed due to a database error: {str(e)}"}), 500
 
 
+@app.route('/admission_stats', methods=['GET'])
+def admission_stats():
+    # queue depths and rejection counters of the booking admission layer
+    return jsonify(admission.stats()), 200
+
+
 @app.route('/booking_status/<booking_id>', methods=['GET'])
 def booking_status(booking_id):
     # gets the booking status for a users booking and return the status to the user
@@ -270,7 +277,7 @@ def booking_status(booking_id):
 def confirm_waitlist_booking(booking_id):
     conn = get_db_connection()
     try:
-        conn.execute('BEGIN TRANSACTION')
+        conn.execute('BEGIN IMMEDIATE')
         
         waitlist_entry = conn.execute('SELECT * FROM waitlists WHERE waitlist_id = ?', (booking_id,)).fetchone()
         if waitlist_entry:
@@ -295,6 +302,8 @@ def confirm_waitlist_booking(booking_id):
     except sqlite3.OperationalError as e:
         conn.rollback()
         conn.close()
+        if is_database_busy(e):
+            return admission.database_busy()
         return jsonify({"error": f"Booking confirmation failed due to a database error: {str(e)}"}), 500
 
 
@@ -302,7 +311,7 @@ def confirm_waitlist_booking(booking_id):
 def cancel_booking(booking_id):
     conn = get_db_connection()
     try:
-        conn.execute('BEGIN TRANSACTION')
+        conn.execute('BEGIN IMMEDIATE')
         
         booking = conn.execute('SELECT * FROM bookings WHERE booking_id = ?', (booking_id,)).fetchone()
 
@@ -325,6 +334,8 @@ def cancel_booking(booking_id):
     except sqlite3.OperationalError as e:
         conn.rollback()
         conn.close()
+        if is_database_busy(e):
+            return admission.database_busy()
         return jsonify({"error": f"Booking cancellation failed due to a database error: {str(e)}"}), 500
 
 @app.route('/search_conferences', methods=['GET'])
@@ -387,27 +398,23 @@ def suggest_conferences(user_id):
         conn.close()
         return jsonify({"error": "User not found"}), 404
     
-    interested_topics = user['interested_topics'].split(',')
+    interested_topics = set(user['interested_topics'].split(','))
+    booked_names, booked_intervals = load_booked_intervals(conn, user_id)
     
-    # Fetch upcoming conferences
+    # Fetch upcoming conferences that are not sold out, in start order for the overlap sweep
     now = datetime.now(timezone.utc).isoformat()
-    query = 'SELECT * FROM conferences WHERE start_timestamp > ?'
-    conferences = conn.execute(query, (now,)).fetchall()
+    query = '''SELECT * FROM conferences
+               WHERE start_timestamp > ? AND available_slots > 0 ORDER BY start_timestamp'''
+    conferences = remove_clashing(conn.execute(query, (now,)).fetchall(), booked_names, booked_intervals)
 
-    # Rank conferences based on user interests
-    ranked_conferences = []
-    for conf in conferences:
-        conf_topics = set(conf['topics'].split(','))
-        match_count = len(conf_topics.intersection(interested_topics))
-        ranked_conferences.append((match_count, dict(conf)))
-    
-    # Sort by match count and take top 10
-    ranked_conferences.sort(reverse=True, key=lambda x: x[0])
-    top_conferences = [conf[1] for conf in ranked_conferences[:10]]
+    # Rank conferences based on user interests and take top 10
+    top_conferences = [dict(conf) for conf in heapq.nlargest(
+        10, conferences, key=lambda conf: len(interested_topics.intersection(conf['topics'].split(','))))]
     
     conn.close()
     return jsonify(top_conferences), 200
 
 
 if __name__ == '__main__':
+    create_tables()
     app.run(debug=True)
@@ -0,0 +1,138 @@
+"""Throughput of serve.py on the booking and search routes for different worker counts.
+
+Each run starts the server on a fresh database in a temporary directory, seeds users and
+non-overlapping conferences, then drives it from several client processes for a fixed time.
+Successive bookings go round-robin over the conferences so the per-conference queue and rate
+limit are not what gets measured. The global booking rate limit is raised for the same reason
+(--global-rate). "ok/s" counts 2xx responses only; the other statuses are listed separately.
+
+    python bench_serve.py --workers 1 2 4 --clients 8 --duration 10
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+NUM_USERS = 200
+NUM_CONFERENCES = 200
+FORM_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+
+def request(port, method, path, form=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        if form is None:
+            conn.request(method, path)
+        else:
+            conn.request(method, path, urlencode(form), FORM_HEADERS)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def wait_until_up(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+def seed(port):
+    start = datetime(2030, 1, 1, 10, 0, 0)
+    for i in range(NUM_USERS):
+        request(port, 'POST', '/add_user', {'user_id': f'user{i}', 'interested_topics': 'AI,Cloud'})
+    for i in range(NUM_CONFERENCES):
+        day = start + timedelta(days=i)
+        request(port, 'POST', '/add_conference', {
+            'name': f'Conference {i}',
+            'location': 'Hyderabad' if i % 2 else 'Bangalore',
+            'topics': 'AI' if i % 3 else 'Cloud',
+            'start_timestamp': day.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'end_timestamp': (day + timedelta(hours=4)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'available_slots': str(NUM_USERS),
+        })
+
+
+def client(port, route, client_id, num_clients, duration, results):
+    counts = {}
+    k = client_id
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        if route == 'book':
+            form = {'conference_name': f'Conference {k % NUM_CONFERENCES}',
+                    'user_id': f'user{(k // NUM_CONFERENCES) % NUM_USERS}'}
+            status = request(port, 'POST', '/book_conference', form)
+        else:
+            status = request(port, 'GET', '/search_conferences?location=Hyderabad&min_duration=2')
+        counts[status] = counts.get(status, 0) + 1
+        k += num_clients
+    results.put(counts)
+
+
+def run(module, workers, route, clients, duration, port, global_rate):
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ, PYTHONPATH=HERE)
+    server = subprocess.Popen([sys.executable, os.path.join(HERE, 'serve.py'), '--module', module,
+                               '--workers', str(workers), '--port', str(port),
+                               '--global-rate', str(global_rate), '--global-burst', str(int(global_rate))],
+                              cwd=workdir, env=env, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(port)
+        seed(port)
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=client, args=(port, route, i, clients, duration, results))
+                 for i in range(clients)]
+        for p in procs:
+            p.start()
+        totals = {}
+        for _ in procs:
+            for status, count in results.get().items():
+                totals[status] = totals.get(status, 0) + count
+        for p in procs:
+            p.join()
+        return totals
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='api_with_searchand_suggest')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--global-rate', type=float, default=100000,
+                        help='global booking rate limit passed to serve.py')
+    args = parser.parse_args()
+
+    print(f'{"route":<8}{"workers":>8}{"ok/s":>10}{"total/s":>10}  statuses')
+    for route in ('book', 'search'):
+        for workers in args.workers:
+            totals = run(args.module, workers, route, args.clients, args.duration, args.port,
+                         args.global_rate)
+            ok_rate = sum(count for status, count in totals.items() if 200 <= status < 300) / args.duration
+            rate = sum(totals.values()) / args.duration
+            statuses = ', '.join(f'{status}: {count}' for status, count in sorted(totals.items()))
+            print(f'{route:<8}{workers:>8}{ok_rate:>10.1f}{rate:>10.1f}  {statuses}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Validation cost per request: the old character loops and double strptime against schema.py.
+
+Measures the payloads of a 10-topic conference and a 50-topic user with timeit.
+
+    python bench_validation.py --number 20000
+"""
+import argparse
+from datetime import datetime
+import timeit
+
+from schema import CONFERENCE_SCHEMA, USER_SCHEMA
+
+CONFERENCE = {
+    'name': 'Python Conference 2030',
+    'location': 'Hyderabad International Convention Centre',
+    'topics': ','.join(f'Topic Number {i}' for i in range(10)),
+    'start_timestamp': '2030-08-01T10:00:00Z',
+    'end_timestamp': '2030-08-01T20:00:00Z',
+    'available_slots': '100',
+}
+USER = {
+    'user_id': 'user1234567890',
+    'interested_topics': ','.join(f'Interested Topic {i}' for i in range(50)),
+}
+
+
+def check_valid_string(word):
+    for letter in word:
+        if not (('a' <= letter <= 'z') or ('A' <= letter <= 'Z') or ('0' <= letter <= '9') or letter == ' '):
+            return False
+    return True
+
+
+def check_valid_string_userID(word):
+    for letter in word:
+        if not (('a' <= letter <= 'z') or ('A' <= letter <= 'Z') or ('0' <= letter <= '9')):
+            return False
+    return True
+
+
+def validate_timestamp(timestamp):
+    try:
+        datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ')
+        return True
+    except ValueError:
+        return False
+
+
+def legacy_conference(data):
+    # the checks add_conference ran before schema.py
+    all_topics = data['topics'].split(',')
+    if not check_valid_string(data['name']) or not check_valid_string(data['location']):
+        return False
+    for topic in all_topics:
+        if not check_valid_string(topic):
+            return False
+    if len(all_topics) > 10:
+        return False
+    if not validate_timestamp(data['start_timestamp']) or not validate_timestamp(data['end_timestamp']):
+        return False
+    datetime.strptime(data['start_timestamp'], '%Y-%m-%dT%H:%M:%SZ')
+    datetime.strptime(data['end_timestamp'], '%Y-%m-%dT%H:%M:%SZ')
+    return int(data['available_slots']) > 0
+
+
+def legacy_user(data):
+    # the checks add_user ran before schema.py
+    if not check_valid_string_userID(data['user_id']):
+        return False
+    all_topics = data['interested_topics'].split(',')
+    if len(all_topics) > 50:
+        return False
+    for topic in all_topics:
+        if not check_valid_string(topic):
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [
+        ('conference (10 topics)', lambda: legacy_conference(CONFERENCE), lambda: CONFERENCE_SCHEMA.load(CONFERENCE)),
+        ('user (50 topics)', lambda: legacy_user(USER), lambda: USER_SCHEMA.load(USER)),
+    ]
+    print(f'{"payload":<24}{"legacy us":>12}{"schema us":>12}{"speedup":>10}')
+    for label, legacy, schema in cases:
+        legacy_us = min(timeit.repeat(legacy, number=args.number, repeat=args.repeat)) / args.number * 1e6
+        schema_us = min(timeit.repeat(schema, number=args.number, repeat=args.repeat)) / args.number * 1e6
+        print(f'{label:<24}{legacy_us:>12.2f}{schema_us:>12.2f}{legacy_us / schema_us:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Declarative request schemas for the write routes.
+
+Each field compiles its validator once at import time and parses its value exactly once per
+request. Bodies are read from JSON when the request is sent as ``application/json`` and from
+form data otherwise, and every problem is reported as a ValidationError carrying the 400 message.
+"""
+from datetime import datetime
+import re
+
+from flask import request
+
+TIMESTAMP_FORMAT_ERROR = "Timestamp format is incorrect. Use 'YYYY-MM-DDTHH:MM:SSZ' format."
+
+NAME_PATTERN = re.compile(r'[A-Za-z0-9 ]*')
+USER_ID_PATTERN = re.compile(r'[A-Za-z0-9]*')
+# same strings datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ') accepts, datetime() checks the ranges
+TIMESTAMP_PATTERN = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})T(\d{1,2}):(\d{1,2}):(\d{1,2})Z', re.IGNORECASE)
+
+
+class ValidationError(Exception):
+    pass
+
+
+def request_data():
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            raise ValidationError("Request body must be a JSON object.")
+        return data
+    return request.form
+
+
+def string(pattern, error):
+    def parse(value):
+        if not isinstance(value, str) or not pattern.fullmatch(value):
+            raise ValidationError(error)
+        return value
+    return parse
+
+
+def text(error):
+    def parse(value):
+        if not isinstance(value, str):
+            raise ValidationError(error)
+        return value
+    return parse
+
+
+def topic_list(pattern, max_topics, error, count_error):
+    # accepts "Topic1,Topic2" or, from JSON, ["Topic1", "Topic2"]; returns the comma separated string
+    def parse(value):
+        if isinstance(value, list):
+            if not all(isinstance(topic, str) for topic in value):
+                raise ValidationError(error)
+            topics = value
+            value = ','.join(topics)
+        elif isinstance(value, str):
+            topics = value.split(',')
+        else:
+            raise ValidationError(error)
+        if len(topics) > max_topics:
+            raise ValidationError(count_error)
+        for topic in topics:
+            if not pattern.fullmatch(topic):
+                raise ValidationError(error)
+        return value
+    return parse
+
+
+def timestamp(value):
+    match = TIMESTAMP_PATTERN.fullmatch(value) if isinstance(value, str) else None
+    if not match:
+        raise ValidationError(TIMESTAMP_FORMAT_ERROR)
+    try:
+        return datetime(*map(int, match.groups()))
+    except ValueError:
+        raise ValidationError(TIMESTAMP_FORMAT_ERROR)
+
+
+def positive_int(error, non_positive_error):
+    def parse(value):
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValidationError(error)
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValidationError(error)
+        if value <= 0:
+            raise ValidationError(non_positive_error)
+        return value
+    return parse
+
+
+class Schema:
+    def __init__(self, **fields):
+        self.fields = list(fields.items())
+
+    def load(self, data):
+        values = {}
+        for name, parse in self.fields:
+            if name not in data:
+                raise ValidationError(f"Missing required field '{name}'.")
+            values[name] = parse(data[name])
+        return values
+
+
+NAME_ERROR = "No other characters except alphanumeric characters and spaces are allowed for name, location."
+TOPICS_ERROR = "No other characters except alphanumeric characters and spaces are allowed for topics."
+
+CONFERENCE_SCHEMA = Schema(
+    name=string(NAME_PATTERN, NAME_ERROR),
+    location=string(NAME_PATTERN, NAME_ERROR),
+    topics=topic_list(NAME_PATTERN, 10, TOPICS_ERROR, "You are allowed to mention only up to 10 topics!"),
+    start_timestamp=timestamp,
+    end_timestamp=timestamp,
+    available_slots=positive_int("Available slots should be an integer.",
+                                 "Available slots should be greater than 0."),
+)
+
+USER_SCHEMA = Schema(
+    user_id=string(USER_ID_PATTERN, "No other characters except alphanumeric characters for userID."),
+    interested_topics=topic_list(NAME_PATTERN, 50, TOPICS_ERROR, "Maximum of 50 interested topics allowed."),
+)
+
+BOOKING_SCHEMA = Schema(
+    conference_name=text("Conference name must be a string."),
+    user_id=text("User ID must be a string."),
+)
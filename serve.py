@@ -0,0 +1,203 @@
+"""Production entry point: a pre-forking server for the conference booking API.
+
+The parent process creates the tables once, binds the listening socket and forks
+``--workers`` processes that all accept on it. Signals sent to the parent:
+
+- SIGTERM / SIGINT: graceful shutdown, workers finish in-flight requests then exit.
+- SIGHUP: graceful restart, workers are replaced one at a time so the socket never goes unserved.
+
+Workers that die unexpectedly are respawned, with a growing delay if they keep crashing on start. Needs ``os.fork``, so it does not run on Windows.
+
+Admission state (see admission.py) is kept per worker. The parent splits the configured limits
+evenly across the workers before forking. A whole-number limit smaller than the worker count (or not
+a multiple of it) can't be split exactly, since every worker gets at least 1. In that case the parent
+prints a warning with the combined value that actually applies. The per-conference FIFO order only
+holds within one worker. Across workers, bookings are serialized by SQLite itself.
+
+    python serve.py --module api_with_searchand_suggest --workers 4 --port 8000
+"""
+import argparse
+import importlib
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from werkzeug.serving import make_server
+
+GRACEFUL_TIMEOUT = 30
+# a worker exiting sooner than this after being spawned counts as a failed start; repeated failed
+# starts back off exponentially up to MAX_RESPAWN_DELAY and the server gives up after MAX_FAILED_STARTS
+MIN_WORKER_UPTIME = 5
+MAX_RESPAWN_DELAY = 30
+MAX_FAILED_STARTS = 10
+
+
+def run_worker(module, sock):
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, module.app, threaded=True, fd=sock.fileno())
+    # keep track of request threads so server_close() waits for in-flight requests
+    server.daemon_threads = False
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    server.serve_forever(poll_interval=0.5)
+    server.server_close()
+    os._exit(0)
+
+
+class Arbiter:
+    def __init__(self, module, sock, workers):
+        self.module = module
+        self.sock = sock
+        self.num_workers = workers
+        self.workers = {}
+        self.stopping = False
+        self.restarting = False
+        self.failed_starts = 0
+        self.last_failure = 0.0
+        self.next_spawn = 0.0
+        self.exit_code = 0
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(self.module, self.sock)
+            except BaseException:
+                traceback.print_exc()
+                sys.stderr.flush()
+            finally:
+                os._exit(1)
+        self.workers[pid] = time.monotonic()
+        return pid
+
+    def stop_worker(self, pid):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        while time.monotonic() < deadline:
+            if os.waitpid(pid, os.WNOHANG)[0]:
+                break
+            time.sleep(0.1)
+        else:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.workers.pop(pid, None)
+
+    def reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            now = time.monotonic()
+            if os.WIFSIGNALED(status):
+                reason = f'signal {os.WTERMSIG(status)}'
+            else:
+                reason = f'status {os.WEXITSTATUS(status)}'
+            print(f'Worker {pid} exited unexpectedly with {reason}', file=sys.stderr)
+            if now - started < MIN_WORKER_UPTIME:
+                self.failed_starts += 1
+                self.last_failure = now
+                delay = min(MAX_RESPAWN_DELAY, 0.5 * 2 ** self.failed_starts)
+                self.next_spawn = now + delay
+                if self.failed_starts >= MAX_FAILED_STARTS:
+                    print(f'Workers failed to start {self.failed_starts} times in a row, giving up',
+                          file=sys.stderr)
+                    self.stopping = True
+                    self.exit_code = 1
+                else:
+                    print(f'Respawning in {delay:.1f}s', file=sys.stderr)
+            else:
+                self.failed_starts = 0
+
+    def restart(self):
+        for pid in list(self.workers):
+            self.spawn()
+            self.stop_worker(pid)
+
+    def handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def handle_restart(self, signum, frame):
+        self.restarting = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_restart)
+        while not self.stopping:
+            if self.restarting:
+                self.restarting = False
+                self.restart()
+            self.reap()
+            # only a worker spawned after the last failed start proves the workers can start again,
+            # older healthy workers say nothing about a replacement that keeps crashing
+            now = time.monotonic()
+            if self.failed_starts and any(started > self.last_failure and now - started >= MIN_WORKER_UPTIME
+                                          for started in self.workers.values()):
+                self.failed_starts = 0
+            while (not self.stopping and len(self.workers) < self.num_workers
+                   and time.monotonic() >= self.next_spawn):
+                self.spawn()
+            time.sleep(0.5)
+        for pid in list(self.workers):
+            os.kill(pid, signal.SIGTERM)
+        for pid in list(self.workers):
+            self.stop_worker(pid)
+        self.sock.close()
+        return self.exit_code
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the conference booking API with pre-forked workers.')
+    parser.add_argument('--module', default='api_with_searchand_suggest', help='module exposing the Flask app')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--backlog', type=int, default=1024)
+    parser.add_argument('--global-rate', type=float, help='booking requests per second across all workers')
+    parser.add_argument('--global-burst', type=int, help='booking burst size across all workers')
+    parser.add_argument('--max-in-flight', type=int, help='bookings running against the database at once')
+    args = parser.parse_args(argv)
+
+    if args.workers <= 0:
+        parser.error('--workers should be greater than 0.')
+
+    module = importlib.import_module(args.module)
+    module.create_tables()
+    limits = {name: value for name, value in (('global_rate', args.global_rate),
+                                              ('global_burst', args.global_burst),
+                                              ('max_in_flight', args.max_in_flight)) if value is not None}
+    for name, (total, combined) in module.admission.configure(workers=args.workers, **limits).items():
+        print(f'Warning: {name} of {total} cannot be split evenly across {args.workers} workers, '
+              f'{combined} applies in total', file=sys.stderr)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(args.backlog)
+    sock.set_inheritable(True)
+
+    print(f'Serving {args.module} on http://{args.host}:{args.port} with {args.workers} workers '
+          f'(pid {os.getpid()})', file=sys.stderr)
+    sys.exit(Arbiter(module, sock, args.workers).run())
+
+
+if __name__ == '__main__':
+    main()